@@ -1,100 +1,437 @@
 
-import argparse, yaml, re, json
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer, util
+import argparse, yaml, re, json, os, threading, hashlib
+import numpy as np
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator
+from embedding_store import EmbeddingStore, chunk_key
+from batcher import EncodeBatcher
+from rules import compile_rules, validate_baseline
+from embedding_backends import BACKENDS, OnnxEncoder
+import metrics
 
 EMB_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMB_BACKEND = os.environ.get("EMB_BACKEND", "torch")      # torch | onnx | onnx-int8
+EMB_ONNX_DIR = os.environ.get("EMB_ONNX_DIR", ".onnx")
+EMB_NUM_THREADS = int(os.environ.get("EMB_NUM_THREADS", "0"))
 _model = None
+DEFAULT_TOP_K = 3
+DEFAULT_BASELINE = "baselines/default.yaml"
+ENCODE_BATCH_SIZE = 64
+STREAM_WINDOW = 256          # chunks encoded per step by analyze_stream
+MAX_CHUNK_CHARS = 20000      # flush point for streamed text with no sentence boundary
+_SENTENCE_SPLIT = re.compile(r'(?<=[.;:])\s+')
+
+# optional content-addressed chunk embedding store shared across requests/workers
+EMB_STORE_PATH = os.environ.get("EMB_STORE_PATH")
+EMB_STORE_MAX_ENTRIES = int(os.environ.get("EMB_STORE_MAX_ENTRIES", "1000000"))
+EMB_STORE_READ_ONLY = os.environ.get("EMB_STORE_READ_ONLY", "0") == "1"
+_store = None
+_batcher = None
+_engine = None  # set by configure_engine("process", ...)
+
+# baseline path -> (fingerprint, requirement keys, normalized embedding matrix)
+_baseline_embs: Dict[str, Any] = {}
+_baseline_embs_lock = threading.Lock()
+_baseline_embs_stats = {"hits": 0, "misses": 0}
+_rules_cache: Dict[str, Any] = {}
+_digest_cache: Dict[str, Any] = {}
+_parsed_baselines: Dict[str, Any] = {}
 
 def get_model():
     global _model
     if _model is None:
-        _model = SentenceTransformer(EMB_MODEL_NAME)
+        if EMB_BACKEND not in BACKENDS:
+            raise ValueError(f"unknown EMB_BACKEND {EMB_BACKEND!r}, expected one of {BACKENDS}")
+        if EMB_BACKEND == "torch":
+            # deferred: torch/transformers cost seconds to import and most CLI paths never encode
+            from sentence_transformers import SentenceTransformer
+            _model = SentenceTransformer(EMB_MODEL_NAME)
+        else:
+            _model = OnnxEncoder(EMB_MODEL_NAME, quantize=EMB_BACKEND == "onnx-int8",
+                                 cache_dir=EMB_ONNX_DIR, num_threads=EMB_NUM_THREADS)
     return _model
 
+def embedding_id() -> str:
+    # backends produce slightly different vectors, so caches are keyed on both
+    return f"{EMB_MODEL_NAME}@{EMB_BACKEND}"
+
+def configure_engine(mode: str = "local", workers: int = None, threads_per_worker: int = 1):
+    global _engine
+    if _engine is not None:
+        _engine.shutdown()
+        _engine = None
+    if mode == "process":
+        from engine import ProcessEngine
+        _engine = ProcessEngine(workers, threads_per_worker)
+    elif mode != "local":
+        raise ValueError(f"unknown engine mode: {mode}")
+    return _engine
+
+def enable_batching(max_batch_size: int = 256, max_wait_ms: float = 5.0):
+    global _batcher
+    if _batcher is None:
+        _batcher = EncodeBatcher(lambda texts: _model_encode(texts, max_batch_size), max_batch_size, max_wait_ms)
+    return _batcher
+
+def encode(texts: List[str], batch_size: int = ENCODE_BATCH_SIZE):
+    # all model calls go through here so concurrent requests can share batches, and so
+    # with a process engine the model only ever runs (and is only loaded) in its workers
+    if _engine is not None:
+        return _engine.encode(texts, batch_size)
+    if _batcher is not None:
+        return _batcher.encode(texts)
+    return _model_encode(texts, batch_size)
+
+def _model_encode(texts: List[str], batch_size: int):
+    metrics.ENCODE_BATCH_TEXTS.observe(len(texts))
+    return get_model().encode(texts, batch_size=batch_size, normalize_embeddings=True)
+
+def get_store():
+    global _store
+    if _store is None and EMB_STORE_PATH:
+        _store = EmbeddingStore(EMB_STORE_PATH, EMB_STORE_MAX_ENTRIES, EMB_STORE_READ_ONLY)
+    return _store
+
+def encode_chunks(chunks: List[str], batch_size: int = ENCODE_BATCH_SIZE):
+    # encode each distinct chunk once, and only if the store hasn't seen it before
+    store = get_store()
+    uniq = list(dict.fromkeys(chunks))
+    vecs, keys = {}, {}
+    if store is not None:
+        keys = {c: chunk_key(embedding_id(), c) for c in uniq}
+        cached = store.get_many(list(keys.values()))
+        vecs = {c: cached[k].astype(np.float32) for c, k in keys.items() if k in cached}
+    # longest first so each padded batch holds similarly sized sequences
+    todo = sorted((c for c in uniq if c not in vecs), key=len, reverse=True)
+    if todo:
+        new = encode(todo, batch_size)
+        vecs.update(zip(todo, new))
+        if store is not None:
+            store.put_many({keys[c]: v for c, v in zip(todo, new)})
+    if not chunks:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.stack([vecs[c] for c in chunks])
+
 def chunk_text(text: str) -> List[str]:
-    parts = re.split(r'(?<=[.;:])\s+', text)
+    parts = _SENTENCE_SPLIT.split(text)
     return [p.strip() for p in parts if p.strip()]
 
+def iter_chunks(pieces: Iterable[str], max_chars: int = MAX_CHUNK_CHARS) -> Iterator[str]:
+    # same boundaries as chunk_text, but over a stream of text pieces (file reads, pages);
+    # only the unfinished trailing sentence is buffered between pieces
+    buf = ""
+    for piece in pieces:
+        parts = _SENTENCE_SPLIT.split(buf + piece)
+        buf = parts.pop()
+        for p in parts:
+            p = p.strip()
+            if p:
+                yield p
+        if len(buf) > max_chars:
+            if buf.strip():
+                yield buf.strip()
+            buf = ""
+    if buf.strip():
+        yield buf.strip()
+
+def iter_text(f, size: int = 1 << 16) -> Iterator[str]:
+    return iter(lambda: f.read(size), "")
+
 def load_baseline(path: str) -> Dict[str, Any]:
-    with open(path, "r") as f:
-        return yaml.safe_load(f)
+    # parsed once per file version; a stat per call instead of a YAML parse.
+    # Callers share the returned dict and must not mutate it.
+    key = os.path.abspath(path)
+    fp = baseline_fingerprint(path)
+    cached = _parsed_baselines.get(key)
+    if cached is None or cached[0] != fp:
+        with open(path, "r") as f:
+            cached = _parsed_baselines[key] = (fp, yaml.safe_load(f))
+    return cached[1]
+
+def baseline_fingerprint(path: str):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, embedding_id())
+
+def baseline_digest(path: str) -> str:
+    # sha256 of the baseline file contents, recomputed only when its mtime/size change
+    key = os.path.abspath(path)
+    fp = baseline_fingerprint(path)
+    cached = _digest_cache.get(key)
+    if cached is None or cached[0] != fp:
+        with open(path, "rb") as f:
+            cached = _digest_cache[key] = (fp, hashlib.sha256(f.read()).hexdigest())
+    return cached[1]
+
+def encode_baseline(path: str, baseline_texts: Dict[str, str]):
+    key = os.path.abspath(path)
+    fp = baseline_fingerprint(path)
+    keys = list(baseline_texts)
+    with _baseline_embs_lock:
+        cached = _baseline_embs.get(key)
+        if cached is not None and cached[0] == fp and cached[1] == keys:
+            _baseline_embs_stats["hits"] += 1
+            return cached[2]
+        _baseline_embs_stats["misses"] += 1
+    embs = encode([baseline_texts[k] for k in keys])
+    with _baseline_embs_lock:
+        _baseline_embs[key] = (fp, keys, embs)
+    return embs
+
+def baseline_cache_info() -> Dict[str, int]:
+    with _baseline_embs_lock:
+        return dict(_baseline_embs_stats, size=len(_baseline_embs))
+
+def _top_k(scores, k: int):
+    if k < 1:
+        raise ValueError(f"top_k must be >= 1, got {k}")
+    k = min(k, scores.shape[1])
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
 
-def find_best_matches(chunks: List[str], baseline_texts: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
-    model = get_model()
-    chunk_embs = model.encode(chunks, convert_to_tensor=True, normalize_embeddings=True)
+def find_best_matches(chunks: List[str], baseline_texts: Dict[str, str], base_embs=None, top_k: int = DEFAULT_TOP_K) -> Dict[str, Dict[str, Any]]:
+    return match_embeddings(chunks, encode_chunks(chunks), baseline_texts, base_embs, top_k)
+
+def match_embeddings(chunks: List[str], chunk_embs, baseline_texts: Dict[str, str], base_embs=None, top_k: int = DEFAULT_TOP_K) -> Dict[str, Dict[str, Any]]:
+    if not chunks:
+        return {}
+    if base_embs is None:
+        base_embs = encode(list(baseline_texts.values()))
+    # rows are unit-normalized, so one matmul gives the requirements x chunks cosine matrix
+    scores = base_embs @ chunk_embs.T
+    idx, vals = _top_k(scores, top_k)
+    return _build_matches(baseline_texts, idx, vals, chunks)
+
+def _build_matches(baseline_texts: Dict[str, str], idx, vals, chunks) -> Dict[str, Dict[str, Any]]:
     out = {}
-    for key, text in baseline_texts.items():
-        base_emb = model.encode([text], convert_to_tensor=True, normalize_embeddings=True)
-        cos_scores = util.cos_sim(base_emb, chunk_embs)[0]
-        best_idx = int(cos_scores.argmax())
+    for key, row_idx, row_vals in zip(baseline_texts, idx.tolist(), vals.tolist()):
         out[key] = {
-            "best_chunk": chunks[best_idx],
-            "score": float(cos_scores[best_idx]),
-            "index": best_idx
+            "best_chunk": chunks[row_idx[0]],
+            "score": float(row_vals[0]),
+            "index": row_idx[0],
+            "candidates": [{"chunk": chunks[i], "score": float(v), "index": i} for i, v in zip(row_idx, row_vals)]
         }
     return out
 
-def apply_rules(baseline: Dict[str, Any], matches: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+def get_rules(baseline_path: str, baseline: Dict[str, Any]):
+    # compiled rules are reused until the baseline file changes
+    key = os.path.abspath(baseline_path)
+    fp = baseline_fingerprint(baseline_path)
+    cached = _rules_cache.get(key)
+    if cached is None or cached[0] != fp:
+        cached = _rules_cache[key] = (fp, compile_rules(baseline))
+    return cached[1]
+
+def apply_rules(baseline: Dict[str, Any], matches: Dict[str, Dict[str, Any]], rules=None) -> List[Dict[str, Any]]:
+    if rules is None:
+        rules = compile_rules(baseline)
     deviations = []
-    for key, meta in baseline["requirements"].items():
+    for key, rule in rules:
         m = matches.get(key, {})
-        found = m.get("best_chunk", "")
-        score = m.get("score", 0.0)
-        rule_type = meta.get("type")
-        if rule_type == "numeric_days":
-            nums = [int(x) for x in re.findall(r'(\\d+)\\s*day', found.lower())]
-            found_days = nums[0] if nums else None
-            expected = meta.get("expected_min_days", 30)
-            if found_days is None or found_days < expected:
-                deviations.append({
-                    "item": key,
-                    "expected": f">= {expected} days",
-                    "found": f"{found_days} days" if found_days is not None else "N/A",
-                    "risk": meta.get("risk_if_below", "medium"),
-                    "similarity": round(score, 3),
-                    "evidence": found
-                })
-        elif rule_type == "keyword":
-            expected_val = meta.get("expected_value", "").lower()
-            if expected_val and expected_val not in found.lower():
-                deviations.append({
-                    "item": key,
-                    "expected": expected_val,
-                    "found": found[:300],
-                    "risk": meta.get("risk_if_mismatch", "low"),
-                    "similarity": round(score, 3),
-                    "evidence": found
-                })
-        elif rule_type == "must_include_any":
-            req = [kw.lower() for kw in meta.get("required_keywords", [])]
-            if not any(kw in found.lower() for kw in req):
-                deviations.append({
-                    "item": key,
-                    "expected": f"include one of: {', '.join(req)}",
-                    "found": found[:300],
-                    "risk": meta.get("risk_if_missing", "high"),
-                    "similarity": round(score, 3),
-                    "evidence": found
-                })
-        else:
-            pass
+        candidates = m.get("candidates") or [{"chunk": m.get("best_chunk", ""), "score": m.get("score", 0.0), "index": m.get("index")}]
+        # the best-scoring chunk may not be the clause that satisfies the rule; accept any of the top-k
+        violation = None
+        for cand in candidates:
+            chunk = cand["chunk"]
+            v = rule.check(chunk, chunk.lower())
+            if v is None:
+                if m:
+                    m["rule_match"] = cand["index"]
+                violation = None
+                break
+            if violation is None:
+                violation = v
+        if violation is not None:
+            expected, found, risk = violation
+            deviations.append({
+                "item": key,
+                "expected": expected,
+                "found": found,
+                "risk": risk,
+                "similarity": round(candidates[0]["score"], 3),
+                "evidence": candidates[0]["chunk"]
+            })
     return deviations
 
-def analyze(text: str, baseline_path: str = "baseline.yaml") -> Dict[str, Any]:
+def warm_up(baseline_paths: List[str]):
+    # load the model, pay first-inference costs and precompile baselines before real traffic
+    if _engine is not None:
+        return _engine.warm_up(baseline_paths)
+    encode(["Warm-up sentence for the embedding model."])
+    for path in baseline_paths:
+        baseline = load_baseline(path)
+        get_rules(path, baseline)
+        encode_baseline(path, {k:v["text"] for k,v in baseline["requirements"].items()})
+
+def analyze(text: str, baseline_path: str = DEFAULT_BASELINE, top_k: int = DEFAULT_TOP_K, profile: bool = False) -> Dict[str, Any]:
+    if _engine is not None:
+        return _engine.analyze(text, baseline_path, top_k, profile)
+    if profile:
+        with metrics.profiling() as prof:
+            result = analyze(text, baseline_path, top_k)
+        result["profile"] = {stage: round(secs, 6) for stage, secs in prof.items()}
+        return result
+    with metrics.span("analyze"):
+        with metrics.span("load_baseline"):
+            baseline = load_baseline(baseline_path)
+            baseline_texts = {k:v["text"] for k,v in baseline["requirements"].items()}
+            rules = get_rules(baseline_path, baseline)
+        with metrics.span("encode_baseline"):
+            base_embs = encode_baseline(baseline_path, baseline_texts)
+        with metrics.span("chunk_text"):
+            chunks = chunk_text(text)
+        metrics.DOCUMENT_CHUNKS.observe(len(chunks))
+        with metrics.span("encode"):
+            chunk_embs = encode_chunks(chunks)
+        with metrics.span("cos_sim"):
+            matches = match_embeddings(chunks, chunk_embs, baseline_texts, base_embs, top_k)
+        with metrics.span("apply_rules"):
+            deviations = apply_rules(baseline, matches, rules)
+    return {"chunks": chunks, "matches": matches, "deviations": deviations}
+
+def analyze_stream(pieces: Iterable[str], baseline_path: str = DEFAULT_BASELINE, top_k: int = DEFAULT_TOP_K,
+                   window: int = STREAM_WINDOW, keep_chunks: bool = False) -> Dict[str, Any]:
+    # encodes fixed-size windows of chunks and keeps only each requirement's running
+    # top-k, so memory stays flat no matter how long the document is; keep_chunks
+    # trades that for the same result shape as analyze()
     baseline = load_baseline(baseline_path)
-    chunks = chunk_text(text)
     baseline_texts = {k:v["text"] for k,v in baseline["requirements"].items()}
-    matches = find_best_matches(chunks, baseline_texts)
-    deviations = apply_rules(baseline, matches)
-    return {"chunks": chunks, "matches": matches, "deviations": deviations}
+    base_embs = encode_baseline(baseline_path, baseline_texts)
+    rows = len(baseline_texts)
+    best_idx = np.zeros((rows, 0), dtype=np.int64)
+    best_scores = np.zeros((rows, 0), dtype=np.float32)
+    kept: Dict[int, str] = {}
+    all_chunks: List[str] = []
+    chunks = iter_chunks(pieces)
+    n = 0
+    while True:
+        batch = list(islice(chunks, window))
+        if not batch:
+            break
+        with metrics.span("encode"):
+            embs = encode_chunks(batch)
+        scores = np.concatenate([best_scores, base_embs @ embs.T], axis=1)
+        ids = np.concatenate([best_idx, np.broadcast_to(np.arange(n, n + len(batch)), (rows, len(batch)))], axis=1)
+        sel, best_scores = _top_k(scores, top_k)
+        best_idx = np.take_along_axis(ids, sel, axis=1)
+        kept.update((n + i, c) for i, c in enumerate(batch))
+        if keep_chunks:
+            all_chunks += batch
+        kept = {i: kept[i] for i in set(best_idx.ravel().tolist())}
+        n += len(batch)
+    metrics.DOCUMENT_CHUNKS.observe(n)
+    matches = _build_matches(baseline_texts, best_idx, best_scores, kept) if n else {}
+    with metrics.span("apply_rules"):
+        deviations = apply_rules(baseline, matches, get_rules(baseline_path, baseline))
+    if keep_chunks:
+        return {"chunks": all_chunks, "matches": matches, "deviations": deviations}
+    return {"num_chunks": n, "matches": matches, "deviations": deviations}
+
+def analyze_many(texts: List[str], baseline_paths: List[str] = None, top_k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+    baseline_paths = baseline_paths or [DEFAULT_BASELINE] * len(texts)
+    if _engine is not None:
+        return _engine.analyze_many(texts, baseline_paths, top_k)
+    with metrics.span("load_baseline"):
+        baselines = {p: load_baseline(p) for p in set(baseline_paths)}
+    with metrics.span("chunk_text"):
+        docs = [chunk_text(t) for t in texts]
+    for chunks in docs:
+        metrics.DOCUMENT_CHUNKS.observe(len(chunks))
+    # one model pass over every chunk of every document, then split the rows back per document
+    with metrics.span("encode"):
+        embs = encode_chunks([c for chunks in docs for c in chunks])
+    results, offset = [], 0
+    for chunks, path in zip(docs, baseline_paths):
+        baseline = baselines[path]
+        baseline_texts = {k:v["text"] for k,v in baseline["requirements"].items()}
+        base_embs = encode_baseline(path, baseline_texts)
+        matches = match_embeddings(chunks, embs[offset:offset + len(chunks)], baseline_texts, base_embs, top_k)
+        offset += len(chunks)
+        deviations = apply_rules(baseline, matches, get_rules(path, baseline))
+        results.append({"chunks": chunks, "matches": matches, "deviations": deviations})
+    return results
+
+def escalations(result: Dict[str, Any], score_low: float, score_high: float,
+                rule_failures: bool = True) -> Dict[str, str]:
+    # requirements the deterministic pass cannot settle on its own: best-chunk similarity
+    # inside [score_low, score_high), or (optionally) a failed rule. Maps key -> reason.
+    out = {}
+    if rule_failures:
+        for d in result["deviations"]:
+            out[d["item"]] = "rule_failed"
+    for key, m in result["matches"].items():
+        if key not in out and score_low <= m["score"] < score_high:
+            out[key] = "ambiguous_score"
+    return out
+
+def shape_result(result: Dict[str, Any], deviations_only: bool = False, chunk_refs: str = "text",
+                 evidence_chars: int = None, baseline_path: str = None) -> Dict[str, Any]:
+    # trims what goes over the wire without touching `result`, which may be cached;
+    # chunk_refs="index" drops chunk text from matches in favour of indices into "chunks".
+    # evidence_chars also cuts `found` where the baseline's rule reports a document excerpt
+    if chunk_refs not in ("text", "index"):
+        raise ValueError(f"chunk_refs must be 'text' or 'index', got {chunk_refs!r}")
+    if evidence_chars is not None and evidence_chars < 0:
+        raise ValueError(f"evidence_chars must be >= 0, got {evidence_chars}")
+    deviations = result["deviations"]
+    if evidence_chars is not None:
+        rules = get_rules(baseline_path, load_baseline(baseline_path)) if baseline_path else []
+        excerpts = {key for key, rule in rules if rule.excerpt}
+        deviations = [dict(d, evidence=d["evidence"][:evidence_chars],
+                           **({"found": d["found"][:evidence_chars]} if d["item"] in excerpts else {}))
+                      for d in deviations]
+    out = {k: v for k, v in result.items() if k not in ("chunks", "matches", "deviations")}
+    if not deviations_only:
+        if "chunks" in result:
+            out["chunks"] = result["chunks"]
+        matches = result["matches"]
+        if chunk_refs == "index":
+            matches = {key: {"score": m["score"], "index": m["index"],
+                             "candidates": [{"score": c["score"], "index": c["index"]} for c in m.get("candidates", [])],
+                             **({"rule_match": m["rule_match"]} if "rule_match" in m else {})}
+                       for key, m in matches.items()}
+        out["matches"] = matches
+    out["deviations"] = deviations
+    return out
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--text-file", type=str, default="samples/sample_text.txt")
-    ap.add_argument("--baseline", type=str, default="baseline.yaml")
+    ap.add_argument("--baseline", type=str, default=DEFAULT_BASELINE)
+    ap.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    ap.add_argument("--stream", action="store_true", help="read and encode the file incrementally; omits the chunk list")
+    ap.add_argument("--profile", action="store_true", help="include a per-stage timing breakdown in the output")
+    ap.add_argument("--deviations-only", action="store_true", help="omit chunks and matches from the output")
+    ap.add_argument("--chunk-refs", choices=["text", "index"], default="text", help="reference chunks in matches by text or by index")
+    ap.add_argument("--evidence-chars", type=int, default=None, help="truncate deviation evidence to this many characters")
+    ap.add_argument("--check-baseline", action="store_true", help="validate the baseline and exit without loading the model")
+    ap.add_argument("--serve", metavar="SOCKET", help="run a warm daemon on this Unix socket")
+    ap.add_argument("--connect", metavar="SOCKET", help="send the request to a warm daemon, falling back to local analysis")
     args = ap.parse_args()
-    with open(args.text_file, "r") as f:
-        text = f.read()
-    result = analyze(text, args.baseline)
+    if args.check_baseline:
+        errors = validate_baseline(load_baseline(args.baseline))
+        for e in errors:
+            print(f"{args.baseline}: {e}")
+        raise SystemExit(1 if errors else 0)
+    if args.serve:
+        import daemon
+        daemon.serve(args.serve)
+        raise SystemExit(0)
+    result = None
+    if args.connect:
+        import daemon
+        req = {"text_file": os.path.abspath(args.text_file), "baseline": os.path.abspath(args.baseline),
+               "top_k": args.top_k, "stream": args.stream, "profile": args.profile}
+        try:
+            result = daemon.call(args.connect, req)
+        except OSError:
+            pass
+    if result is None:
+        with open(args.text_file, "r") as f:
+            if args.stream:
+                result = analyze_stream(iter_text(f), args.baseline, args.top_k)
+            else:
+                result = analyze(f.read(), args.baseline, args.top_k, args.profile)
+    result = shape_result(result, args.deviations_only, args.chunk_refs, args.evidence_chars)
     print(json.dumps(result, indent=2))
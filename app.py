@@ -1,69 +1,418 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import Any, Dict, Optional, List
-from analyzer import analyze
+import asyncio, functools, hashlib, os, shutil, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
+import orjson
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from typing import Any, Dict, Literal, Optional, List
+import analyzer, llm, metrics
+from analyzer import analyze, analyze_many, baseline_cache_info, baseline_digest, get_store, shape_result, DEFAULT_TOP_K
+from result_cache import ResultCache
+from baseline_registry import BaselineRegistry
+from pdf_utils import get_cache as get_pdf_cache, iter_pdf_pages, shutdown_pool as shutdown_pdf_pool
 
-app = FastAPI(title="AI Usecase Demo API")
+# requests pick a baseline by ID from this directory; arbitrary paths are never read
+BASELINE_DIR = os.environ.get("BASELINE_DIR", "baselines")
+BASELINE_POLL_SECONDS = float(os.environ.get("BASELINE_POLL_SECONDS", "2"))
+baselines = BaselineRegistry(BASELINE_DIR)
 
-class AnalyzeReq(BaseModel):
+def resolve_baseline(baseline_id: str) -> str:
+    try:
+        return baselines.resolve(baseline_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"unknown baseline: {baseline_id}")
+
+_readiness = {"status": "starting", "error": None}
+
+def _warm_up():
+    _readiness["status"] = "warming"
+    try:
+        analyzer.warm_up(baselines.paths())
+    except Exception as e:
+        _readiness.update(status="failed", error=f"{type(e).__name__}: {e}")
+        return
+    _readiness["status"] = "ready"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # warm up in the background so the process answers liveness checks while /ready stays 503
+    warm = asyncio.get_running_loop().run_in_executor(_analyze_pool, _warm_up)
+    baselines.watch(BASELINE_POLL_SECONDS)
+    yield
+    baselines.close()
+    warm.cancel()
+    shutdown_pdf_pool()
+    await _llm.close()
+
+app = FastAPI(title="AI Usecase Demo API", lifespan=lifespan)
+_llm = llm.OllamaPool()
+
+# ANALYZE_ENGINE=process spreads analysis over worker processes (each with its own
+# torch thread budget); otherwise encode calls from concurrent requests are
+# coalesced into shared model batches in this process
+_batcher = None
+if os.environ.get("ANALYZE_ENGINE", "local") == "process":
+    analyzer.configure_engine("process", int(os.environ.get("ENGINE_WORKERS", "0")) or None,
+                              int(os.environ.get("ENGINE_THREADS_PER_WORKER", "1")))
+elif os.environ.get("ENCODE_BATCHING", "1") == "1":
+    _batcher = analyzer.enable_batching(int(os.environ.get("ENCODE_MAX_BATCH", "256")),
+                                        float(os.environ.get("ENCODE_MAX_WAIT_MS", "5")))
+
+# CPU-heavy analysis runs on its own sized pool instead of Starlette's default threadpool;
+# beyond ANALYZE_WORKERS running + ANALYZE_MAX_QUEUE waiting we shed load with a 503
+ANALYZE_WORKERS = int(os.environ.get("ANALYZE_WORKERS", "4"))
+ANALYZE_MAX_QUEUE = int(os.environ.get("ANALYZE_MAX_QUEUE", "32"))
+ANALYZE_RETRY_AFTER = os.environ.get("ANALYZE_RETRY_AFTER", "1")
+_analyze_pool = ThreadPoolExecutor(max_workers=ANALYZE_WORKERS, thread_name_prefix="analyze")
+_analyze_slots = asyncio.Semaphore(ANALYZE_WORKERS)
+_analyze_pending = 0
+
+async def run_analysis(fn, *args):
+    global _analyze_pending
+    if _analyze_pending >= ANALYZE_WORKERS + ANALYZE_MAX_QUEUE:
+        raise HTTPException(status_code=503, detail="analysis queue is full",
+                            headers={"Retry-After": ANALYZE_RETRY_AFTER})
+    _analyze_pending += 1
+    try:
+        async with _analyze_slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_analyze_pool, functools.partial(fn, *args))
+    finally:
+        _analyze_pending -= 1
+
+# identical /analyze requests (client retries, double-posted uploads) are served from
+# memory; RESULT_CACHE_MAX_MB=0 disables the cache
+RESULT_CACHE_MAX_MB = float(os.environ.get("RESULT_CACHE_MAX_MB", "64"))
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "300"))
+_results = ResultCache(int(RESULT_CACHE_MAX_MB * (1 << 20)), RESULT_CACHE_TTL) if RESULT_CACHE_MAX_MB > 0 else None
+_results_inflight: Dict[str, asyncio.Future] = {}
+
+def result_key(text: str, baseline_path: str, top_k: int) -> str:
+    h = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{h}:{baseline_digest(baseline_path)}:{analyzer.embedding_id()}:{top_k}"
+
+async def cached_analysis(text: str, baseline_path: str, top_k: int):
+    # returns (result, hit); concurrent duplicates wait on the first request instead of re-running it
+    key = result_key(text, baseline_path, top_k)
+    result = _results.get(key)
+    if result is not None:
+        return result, True
+    pending = _results_inflight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending), True
+    fut = asyncio.get_running_loop().create_future()
+    _results_inflight[key] = fut
+    try:
+        result = await run_analysis(analyze, text, baseline_path, top_k)
+        _results.put(key, result)
+        fut.set_result(result)
+        return result, False
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+    except Exception as e:
+        fut.set_exception(e)
+        fut.exception()  # mark retrieved when nobody else was waiting
+        raise
+    finally:
+        del _results_inflight[key]
+
+# response shaping: clients that only want deviations skip most of the payload.
+# Unknown fields are rejected, so a client still sending the removed baseline_path
+# gets a 422 instead of a silent analysis against the default baseline.
+class ShapeOpts(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    deviations_only: bool = False
+    chunk_refs: Literal["text", "index"] = "text"   # "index": matches point into chunks instead of repeating text
+    evidence_chars: Optional[int] = Field(None, ge=0)  # truncate deviation evidence (and excerpt found)
+
+    def shape(self, result: Dict[str, Any], baseline_path: str) -> Dict[str, Any]:
+        return shape_result(result, self.deviations_only, self.chunk_refs, self.evidence_chars, baseline_path)
+
+class AnalyzeReq(ShapeOpts):
     text: str
-    baseline_path: Optional[str] = "baseline.yaml"
+    baseline_id: str = "default"            # file stem of a baseline in BASELINE_DIR
+    top_k: int = Field(DEFAULT_TOP_K, ge=1)  # candidate chunks checked per requirement
+    profile: bool = False                   # return a per-stage timing breakdown inline
 
 class AnalyzeResp(BaseModel):
     result: Dict[str, Any]
 
-@app.post("/analyze", response_model=AnalyzeResp)
-def analyze_endpoint(req: AnalyzeReq):
-    result = analyze(req.text, req.baseline_path)
-    return {"result": result}
+# orjson responses skip response_model re-validation and serialize large results much faster
+@app.post("/analyze", response_model=AnalyzeResp, response_class=ORJSONResponse)
+async def analyze_endpoint(req: AnalyzeReq):
+    path = resolve_baseline(req.baseline_id)
+    if _results is None or req.profile:
+        result = await run_analysis(analyze, req.text, path, req.top_k, req.profile)
+        return ORJSONResponse({"result": req.shape(result, path)})
+    result, hit = await cached_analysis(req.text, path, req.top_k)
+    return ORJSONResponse({"result": req.shape(result, path)}, headers={"X-Cache": "HIT" if hit else "MISS"})
+
+class BatchDoc(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    text: str
+    baseline_id: Optional[str] = None       # defaults to the batch-level baseline_id
+
+class AnalyzeBatchReq(ShapeOpts):
+    documents: List[BatchDoc]
+    baseline_id: str = "default"
+    top_k: int = Field(DEFAULT_TOP_K, ge=1)
+
+class AnalyzeBatchResp(BaseModel):
+    results: List[Dict[str, Any]]
+
+@app.post("/analyze/batch", response_model=AnalyzeBatchResp, response_class=ORJSONResponse)
+async def analyze_batch_endpoint(req: AnalyzeBatchReq):
+    paths = [resolve_baseline(d.baseline_id or req.baseline_id) for d in req.documents]
+    results = await run_analysis(analyze_many, [d.text for d in req.documents], paths, req.top_k)
+    return ORJSONResponse({"results": [req.shape(r, p) for r, p in zip(results, paths)]})
+
+def _pages_as_text(pages):
+    # same text extract_text_from_pdf would produce, fed to the chunker page by page
+    for i, page in enumerate(pages):
+        yield ("\n" + page) if i else page
+
+def analyze_pdf(upload, baseline_path: str, top_k: int, keep_chunks: bool) -> Dict[str, Any]:
+    # pypdf and the extraction pool need a real file; pages are extracted ahead of the
+    # consumer by the pool, so encoding early pages overlaps extracting later ones
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        shutil.copyfileobj(upload, tmp)
+        tmp.flush()
+        return analyzer.analyze_stream(_pages_as_text(iter_pdf_pages(tmp.name, cache=get_pdf_cache())), baseline_path, top_k,
+                                       keep_chunks=keep_chunks)
+
+@app.post("/analyze/pdf", response_model=AnalyzeResp, response_class=ORJSONResponse)
+async def analyze_pdf_endpoint(file: UploadFile = File(...),
+                               baseline_id: str = Form("default"),
+                               top_k: int = Form(DEFAULT_TOP_K, ge=1),
+                               deviations_only: bool = Form(False),
+                               chunk_refs: Literal["text", "index"] = Form("text"),
+                               evidence_chars: Optional[int] = Form(None, ge=0)):
+    path = resolve_baseline(baseline_id)
+    shape = ShapeOpts(deviations_only=deviations_only, chunk_refs=chunk_refs, evidence_chars=evidence_chars)
+    result = await run_analysis(analyze_pdf, file.file, path, top_k, not deviations_only)
+    return ORJSONResponse({"result": shape.shape(result, path)})
+
+@app.get("/baselines")
+def list_baselines():
+    return baselines.info()
+
+@app.get("/ready")
+def ready():
+    code = 200 if _readiness["status"] == "ready" else 503
+    return JSONResponse(status_code=code, content=_readiness)
+
+metrics.register("analyzer_baseline_cache_total", "counter", "Baseline embedding cache lookups.",
+                 lambda: {k: v for k, v in baseline_cache_info().items() if k != "size"}, "result")
+metrics.register("analyzer_embedding_store_total", "counter", "Chunk embedding store lookups.",
+                 lambda: {k: v for k, v in get_store().info().items() if k in ("hits", "misses")} if get_store() else None, "result")
+metrics.register("analyzer_batcher_requests_total", "counter", "Encode requests coalesced by the batcher.",
+                 lambda: _batcher.stats["requests"] if _batcher else None)
+metrics.register("analyzer_batcher_batches_total", "counter", "Model batches run by the batcher.",
+                 lambda: _batcher.stats["batches"] if _batcher else None)
+metrics.register("analyzer_result_cache_total", "counter", "Result cache lookups.",
+                 lambda: {k: _results.stats[k] for k in ("hits", "misses")} if _results else None, "result")
+metrics.register("analyzer_requests_pending", "gauge", "Analysis requests running or queued.",
+                 lambda: _analyze_pending)
+metrics.register("explain_llm_requests_total", "counter", "LLM requests by outcome (requests counts all).",
+                 lambda: dict(_llm.stats), "result")
+metrics.register("explain_llm_waiting", "gauge", "LLM requests queued for a per-model slot.",
+                 lambda: _llm.info()["waiting"], "model")
+
+@app.get("/metrics")
+def metrics_endpoint():
+    # stage timings recorded inside ANALYZE_ENGINE=process workers stay in those processes
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats")
+def stats():
+    store, pdf_cache = get_store(), get_pdf_cache()
+    return {"baseline_cache": baseline_cache_info(),
+            "embedding_store": store.info() if store else None,
+            "encode_batcher": _batcher.info() if _batcher else None,
+            "result_cache": _results.info() if _results else None,
+            "pdf_cache": pdf_cache.info() if pdf_cache else None,
+            "llm": _llm.info(),
+            "analyze_pending": _analyze_pending}
+
+# Optional: local LLM rationale via Ollama (if installed). Generations run on one shared
+# async client, so a slow model holds a connection, not a worker thread; a request whose
+# client has gone away is cancelled instead of generating for nobody
+EXPLAIN_DISCONNECT_POLL = float(os.environ.get("EXPLAIN_DISCONNECT_POLL", "0.5"))
 
-# Optional: local LLM rationale via Ollama (if installed)
 class ExplainReq(BaseModel):
     text: str
     hints: Optional[List[str]] = None        # e.g., ["Termination >= 30 days", "Gov law = Delaware"]
-    model: Optional[str] = "llama3"          # any local model you've pulled with Ollama
+    model: Optional[str] = llm.DEFAULT_MODEL  # any local model you've pulled with Ollama
+    # prefix: first 6000 chars in one prompt; map_reduce: whole document in windows, up
+    # to EXPLAIN_MAX_WINDOWS; retrieval: each baseline requirement with only its top_k matched chunks
+    mode: Literal["map_reduce", "prefix", "retrieval"] = "prefix"
+    window_tokens: int = Field(llm.WINDOW_TOKENS, ge=128)  # prompt budget per window (estimated tokens)
+    baseline_id: str = "default"              # retrieval: requirements to review
+    top_k: int = Field(DEFAULT_TOP_K, ge=1)   # retrieval: chunks sent per requirement
 
 class ExplainResp(BaseModel):
     model: str
     deviations: List[Dict[str, Any]]
+    prompts: int = 1
+    prompt_tokens: int = 0                    # estimated, summed over prompts
 
-@app.post("/explain", response_model=ExplainResp)
-def explain(req: ExplainReq):
+async def cancel_on_disconnect(request: Request, coro):
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=EXPLAIN_DISCONNECT_POLL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise HTTPException(status_code=499, detail="client disconnected")
+    finally:
+        task.cancel()
+
+async def analysis(text: str, baseline_path: str, top_k: int) -> Dict[str, Any]:
+    if _results is None:
+        return await run_analysis(analyze, text, baseline_path, top_k)
+    return (await cached_analysis(text, baseline_path, top_k))[0]
+
+async def explain_prompts(req: ExplainReq) -> List[str]:
+    if req.mode == "prefix":
+        return [llm.build_prompt(req.text[:6000], req.hints)]
+    if req.mode == "retrieval":
+        path = resolve_baseline(req.baseline_id)
+        result = await analysis(req.text, path, req.top_k)
+        requirements = {k: v["text"] for k, v in analyzer.load_baseline(path)["requirements"].items()}
+        return llm.retrieval_prompts(requirements, result["matches"], req.hints, req.window_tokens)
+    windows = llm.split_windows(req.text, req.window_tokens) or [""]
+    return [llm.build_prompt(w, req.hints) for w in windows]
+
+async def capped_prompts(req: ExplainReq) -> List[str]:
+    prompts = await explain_prompts(req)
+    if len(prompts) > llm.MAX_WINDOWS:
+        fixes = "a larger window_tokens, a smaller top_k" if req.mode == "retrieval" else "mode=retrieval, a larger window_tokens"
+        raise HTTPException(status_code=413, detail=(
+            f"{req.mode} needs {len(prompts)} prompts at window_tokens={req.window_tokens}; the limit is "
+            f"{llm.MAX_WINDOWS}. Use {fixes}, or /analyze/tiered"))
+    return prompts
+
+async def llm_call(request: Request, coro):
     try:
-        import ollama
+        with metrics.span("explain_llm"):
+            return await cancel_on_disconnect(request, coro)
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Ollama not installed. pip install ollama && brew install ollama && ollama run llama3 once")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"LLM did not answer within {_llm.timeout:g}s")
+    except HTTPException:
+        raise
     except Exception as e:
-        raise RuntimeError("Ollama not installed. pip install ollama && brew install ollama && ollama run llama3 once") from e
-
-    hints_text = ""
-    if req.hints:
-        hints_text = "\n".join(f"- {h}" for h in req.hints)
-
-    template = f"""You are a document analyst. Extract deviations and risks from the text.
-Return STRICT JSON array of objects with keys:
-item, expected, found, risk (low|medium|high), explanation
-
-Baseline expectations (examples):
-{hints_text if hints_text else "- Termination notice >= 30 days\n- Governing law = Delaware\n- PHI requires Business Associate Agreement (BAA)"} 
-
-Document text:
----
-{{doc}}
----
-JSON ONLY."""
-
-    prompt = template.format(doc=req.text[:6000])
-    resp = ollama.chat(
-        model=req.model or "llama3",
-        messages=[{"role":"user","content": prompt}],
-        options={"temperature": 0.0}
-    )
-    content = resp["message"]["content"]
-    start = content.find("[")
-    end = content.rfind("]")
-    payload = content[start:end+1] if (start != -1 and end != -1 and end > start) else "[]"
-    import json as _json
+        raise HTTPException(status_code=502, detail=f"LLM request failed: {type(e).__name__}: {e}")
+
+@app.post("/explain", response_model=ExplainResp)
+async def explain(req: ExplainReq, request: Request):
+    model, prompts = req.model or llm.DEFAULT_MODEL, await capped_prompts(req)
+    deviations = await llm_call(request, _llm.explain(model, prompts))
+    return {"model": model, "deviations": deviations, "prompts": len(prompts),
+            "prompt_tokens": sum(map(llm.estimate_tokens, prompts))}
+
+# NDJSON stream of {"deviation": {...}} lines, each sent as soon as the model closes that
+# object, then {"done": true, ...}; failures after the response has started arrive as an
+# {"error": ...} line. A client disconnect cancels the generation.
+@app.post("/explain/stream")
+async def explain_stream(req: ExplainReq):
+    model, prompts = req.model or llm.DEFAULT_MODEL, await capped_prompts(req)
     try:
-        data = _json.loads(payload)
-    except Exception:
-        data = []
-    return {"model": req.model or "llama3", "deviations": data}
+        _llm.client()
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Ollama not installed. pip install ollama && brew install ollama && ollama run llama3 once")
+
+    async def lines():
+        count, t0 = 0, time.perf_counter()
+        try:
+            with metrics.span("explain_llm"):
+                async for deviation in _llm.stream_deviations(model, prompts):
+                    if count == 0:
+                        metrics.STAGE_SECONDS.observe(time.perf_counter() - t0, "explain_first_deviation")
+                    count += 1
+                    yield orjson.dumps({"deviation": deviation}) + b"\n"
+        except asyncio.TimeoutError:
+            yield orjson.dumps({"error": f"LLM did not answer within {_llm.timeout:g}s"}) + b"\n"
+        except Exception as e:
+            yield orjson.dumps({"error": f"LLM request failed: {type(e).__name__}: {e}"}) + b"\n"
+        yield orjson.dumps({"done": True, "model": model, "deviations": count, "prompts": len(prompts),
+                            "prompt_tokens": sum(map(llm.estimate_tokens, prompts))}) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+# Tiered analysis: the deterministic pass (embeddings + rules) settles what it can and
+# only requirements it is unsure about go to the LLM, as retrieval prompts holding just
+# their matched clauses. If the LLM is unavailable the rule verdicts are returned instead.
+TIER_SCORE_LOW = float(os.environ.get("TIER_SCORE_LOW", "0.3"))
+TIER_SCORE_HIGH = float(os.environ.get("TIER_SCORE_HIGH", "0.55"))
+_tier_totals = {"deterministic": 0, "llm": 0, "rule_failed": 0, "ambiguous_score": 0, "llm_fallback": 0}
+
+class TieredReq(BaseModel):
+    text: str
+    baseline_id: str = "default"
+    top_k: int = Field(DEFAULT_TOP_K, ge=1)
+    model: Optional[str] = llm.DEFAULT_MODEL
+    score_low: float = TIER_SCORE_LOW         # best-chunk similarity in [score_low, score_high)
+    score_high: float = TIER_SCORE_HIGH       # is ambiguous and escalated
+    escalate_rule_failures: bool = True       # False: failed rules are final deviations
+    window_tokens: int = Field(llm.WINDOW_TOKENS, ge=128)
+
+    @model_validator(mode="after")
+    def _check_band(self):
+        if self.score_low > self.score_high:
+            raise ValueError(f"score_low ({self.score_low}) must be <= score_high ({self.score_high})")
+        return self
+
+@app.post("/analyze/tiered", response_class=ORJSONResponse)
+async def analyze_tiered(req: TieredReq, request: Request):
+    path = resolve_baseline(req.baseline_id)
+    result = await analysis(req.text, path, req.top_k)
+    escalate = analyzer.escalations(result, req.score_low, req.score_high, req.escalate_rule_failures)
+    rule_devs = {d["item"]: d for d in result["deviations"]}
+    deviations = [dict(d, source="rules") for d in result["deviations"] if d["item"] not in escalate]
+    # tiers are counted over the baseline's requirements: matches is empty for blank text
+    baseline = analyzer.load_baseline(path)
+    model, prompts, fallback, llm_error = req.model or llm.DEFAULT_MODEL, [], [], None
+    if escalate:
+        requirements = {k: baseline["requirements"][k]["text"] for k in escalate}
+        batches = llm.retrieval_batches(requirements, result["matches"], req.window_tokens)
+        prompts = [llm.retrieval_prompt(b) for b in batches]
+        try:
+            answers = [llm.parse_answer(c) for c in await llm_call(request, _llm.complete(model, prompts))]
+        except HTTPException as e:
+            if e.status_code == 499:
+                raise
+            llm_error, answers = e.detail, [None] * len(prompts)
+        for d in llm.merge_deviations(a for a in answers if a is not None):
+            deviations.append(dict(d, item=str(d.get("item", "")).strip("[] "), source="llm"))
+        # an answer with no usable JSON array confirms nothing: its requirements keep
+        # their rule verdicts, while a parseable empty array clears them
+        fallback = [k for b, a in zip(batches, answers) if a is None for k in b]
+        if fallback and llm_error is None:
+            llm_error = f"no parseable deviations array in {sum(a is None for a in answers)} of {len(answers)} LLM answers"
+        deviations += [dict(rule_devs[k], source="rules") for k in fallback if k in rule_devs]
+
+    tiers = {"deterministic": sum(k not in escalate for k in baseline["requirements"]), "llm": len(escalate),
+             "rule_failed": sum(r == "rule_failed" for r in escalate.values()),
+             "ambiguous_score": sum(r == "ambiguous_score" for r in escalate.values()),
+             "llm_fallback": len(fallback)}
+    for k, v in tiers.items():
+        _tier_totals[k] += v
+    scores = {key: round(m["score"], 3) for key, m in result["matches"].items()}
+    requirements = {key: {"score": scores.get(key), "tier": "llm" if key in escalate else "deterministic",
+                          **({"reason": escalate[key]} if key in escalate else {})}
+                    for key in baseline["requirements"]}
+    out = {"deviations": deviations, "requirements": requirements,
+           "tiers": dict(tiers, llm_prompts=len(prompts)), "model": model}
+    if llm_error:
+        out["llm_error"] = llm_error
+    return ORJSONResponse({"result": out})
+
+metrics.register("analyzer_tier_requirements_total", "counter", "Requirements by /analyze/tiered outcome.",
+                 lambda: dict(_tier_totals), "tier")
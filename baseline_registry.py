@@ -0,0 +1,68 @@
+
+import glob, os, threading
+from typing import Any, Dict, List
+
+import analyzer
+from rules import validate_baseline
+
+# Baselines served by the API, loaded from one directory and addressed by ID (the file
+# name without extension). Files are validated on load and re-checked by a polling
+# thread; a file that becomes invalid is withdrawn until it is fixed.
+class BaselineRegistry:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._paths: Dict[str, str] = {}
+        self._fingerprints: Dict[str, Any] = {}
+        self.errors: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.refresh()
+
+    def refresh(self):
+        found = {}
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.yaml")) + glob.glob(os.path.join(self.directory, "*.yml"))):
+            found.setdefault(os.path.splitext(os.path.basename(path))[0], path)
+        with self._lock:
+            for baseline_id in set(self._paths) | set(self.errors):
+                if baseline_id not in found:
+                    self._paths.pop(baseline_id, None)
+                    self._fingerprints.pop(baseline_id, None)
+                    self.errors.pop(baseline_id, None)
+        for baseline_id, path in found.items():
+            try:
+                fp = analyzer.baseline_fingerprint(path)
+                if self._fingerprints.get(baseline_id) == fp:
+                    continue
+                errors = validate_baseline(analyzer.load_baseline(path))
+            except Exception as e:
+                fp, errors = None, [f"{type(e).__name__}: {e}"]
+            with self._lock:
+                self._fingerprints[baseline_id] = fp
+                if errors:
+                    self._paths.pop(baseline_id, None)
+                    self.errors[baseline_id] = errors
+                else:
+                    self._paths[baseline_id] = path
+                    self.errors.pop(baseline_id, None)
+
+    def resolve(self, baseline_id: str) -> str:
+        with self._lock:
+            return self._paths[baseline_id]
+
+    def paths(self) -> List[str]:
+        with self._lock:
+            return list(self._paths.values())
+
+    def watch(self, interval: float = 2.0):
+        def loop():
+            while not self._stop.wait(interval):
+                self.refresh()
+        threading.Thread(target=loop, name="baseline-registry", daemon=True).start()
+
+    def close(self):
+        self._stop.set()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"baselines": {i: {"path": p, "sha256": analyzer.baseline_digest(p)} for i, p in sorted(self._paths.items())},
+                    "errors": dict(self.errors)}
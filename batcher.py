@@ -0,0 +1,59 @@
+
+import queue, threading, time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+# Coalesces encode() calls from concurrent threads into larger model batches: callers
+# block on a future while one worker drains the queue, waits up to max_wait_ms for
+# more work after the first request, encodes everything at once and fans rows back out.
+class EncodeBatcher:
+    def __init__(self, encode_fn: Callable[[List[str]], Any], max_batch_size: int = 256, max_wait_ms: float = 5.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.stats = {"requests": 0, "batches": 0, "texts": 0}
+        self._q: "queue.Queue" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="encode-batcher", daemon=True)
+        self._worker.start()
+
+    def encode(self, texts: List[str]):
+        fut: Future = Future()
+        self._q.put((list(texts), fut))
+        return fut.result()
+
+    def _collect(self):
+        batch = [self._q.get()]
+        n = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while n < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._q.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            n += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            flat = [t for texts, _ in batch for t in texts]
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["texts"] += len(flat)
+            try:
+                embs = self.encode_fn(flat)
+            except BaseException as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            offset = 0
+            for texts, fut in batch:
+                fut.set_result(embs[offset:offset + len(texts)])
+                offset += len(texts)
+
+    def info(self) -> Dict[str, int]:
+        return dict(self.stats, queued=self._q.qsize())
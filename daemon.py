@@ -0,0 +1,51 @@
+
+import json, os, socket, socketserver
+
+# Warm analyzer daemon for short-lived CLI invocations: `analyzer.py --serve SOCK`
+# loads the model once and answers newline-delimited JSON requests on a Unix socket;
+# `analyzer.py --connect SOCK` forwards to it and skips the model cold start.
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        import analyzer
+        for line in self.rfile:
+            try:
+                req = json.loads(line)
+                with open(req["text_file"], "r") as f:
+                    if req.get("stream"):
+                        result = analyzer.analyze_stream(analyzer.iter_text(f), req["baseline"], req["top_k"])
+                    else:
+                        result = analyzer.analyze(f.read(), req["baseline"], req["top_k"], req.get("profile", False))
+                resp = {"result": result}
+            except Exception as e:
+                resp = {"error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(resp).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def serve(path: str):
+    import analyzer
+    analyzer.get_model()
+    # concurrent clients share model batches just like API requests do
+    analyzer.enable_batching()
+    if os.path.exists(path):
+        os.unlink(path)
+    with _Server(path, _Handler) as server:
+        print(f"analyzer daemon listening on {path}", flush=True)
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(path)
+
+def call(path: str, req: dict):
+    # raises OSError when no daemon is listening so callers can fall back to local analysis
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(req).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            resp = json.loads(f.readline())
+    if "error" in resp:
+        raise RuntimeError(resp["error"])
+    return resp["result"]
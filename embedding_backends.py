@@ -0,0 +1,70 @@
+
+import os
+import numpy as np
+from typing import List
+
+# ONNX Runtime encoder for sentence-transformers models with a BERT-style encoder and
+# mean pooling (all-MiniLM-L6-v2 and friends). The graph is exported from the HF
+# checkpoint once, optionally dynamically quantized to int8, and cached on disk.
+BACKENDS = ("torch", "onnx", "onnx-int8")
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2's sentence-transformers max_seq_length
+
+def export_onnx(model_name: str, out_dir: str, quantize: bool) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, model_name.replace("/", "__"))
+    fp32, int8 = base + ".onnx", base + ".int8.onnx"
+    if not os.path.exists(fp32):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+        model = AutoModel.from_pretrained(model_name).eval()
+        dummy = AutoTokenizer.from_pretrained(model_name)(["warm up"], return_tensors="pt")
+        # positional order of BertModel.forward, not the tokenizer's key order
+        names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy]
+        tmp = f"{fp32}.{os.getpid()}.tmp"
+        with torch.no_grad():
+            torch.onnx.export(model, tuple(dummy[n] for n in names), tmp,
+                              input_names=names, output_names=["last_hidden_state"],
+                              dynamic_axes={n: {0: "batch", 1: "seq"} for n in names + ["last_hidden_state"]},
+                              opset_version=14)
+        os.replace(tmp, fp32)  # atomic, so concurrent workers never load a half-written graph
+    if not quantize:
+        return fp32
+    if not os.path.exists(int8):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        tmp = f"{int8}.{os.getpid()}.tmp"
+        quantize_dynamic(fp32, tmp, weight_type=QuantType.QInt8)
+        os.replace(tmp, int8)
+    return int8
+
+class OnnxEncoder:
+    def __init__(self, model_name: str, quantize: bool = True, cache_dir: str = ".onnx", num_threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        opts = ort.SessionOptions()
+        if num_threads:
+            opts.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(export_onnx(model_name, cache_dir, quantize), opts,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    # mirrors the subset of SentenceTransformer.encode the analyzer uses; always returns numpy
+    def encode(self, texts: List[str], batch_size: int = 32, normalize_embeddings: bool = False, **kwargs):
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        out = None
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            enc = self.tokenizer([texts[i] for i in idx], padding=True, truncation=True,
+                                 max_length=MAX_SEQ_LENGTH, return_tensors="np")
+            feeds = {k: v.astype(np.int64) for k, v in enc.items() if k in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            mask = enc["attention_mask"][..., None].astype(np.float32)
+            emb = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if normalize_embeddings:
+                emb /= np.clip(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12, None)
+            if out is None:
+                out = np.empty((len(texts), emb.shape[1]), dtype=np.float32)
+            out[idx] = emb
+        return out
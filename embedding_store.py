@@ -0,0 +1,83 @@
+
+import hashlib, sqlite3, threading, time
+import numpy as np
+from typing import Dict, List
+
+# SQLite keeps the store safe to share between uvicorn workers: WAL mode lets any
+# number of readers run alongside the single writer, and read_only opens never write.
+_SCHEMA = """CREATE TABLE IF NOT EXISTS embeddings (
+    key BLOB PRIMARY KEY,
+    vec BLOB NOT NULL,
+    last_used REAL NOT NULL
+)"""
+_BATCH = 500  # stay under SQLITE_MAX_VARIABLE_NUMBER on old builds
+
+def chunk_key(model_name: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).digest()
+
+class EmbeddingStore:
+    def __init__(self, path: str, max_entries: int = 1_000_000, read_only: bool = False):
+        self.path = path
+        self.max_entries = max_entries
+        self.read_only = read_only
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        if read_only:
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(_SCHEMA)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+            self._conn.commit()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        out = {}
+        uniq = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(uniq), _BATCH):
+                batch = uniq[i:i + _BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, vec in rows:
+                    out[key] = np.frombuffer(vec, dtype=np.float16)
+            if out and not self.read_only:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_used=? WHERE key=?", [(now, k) for k in out])
+                self._conn.commit()
+            self.stats["hits"] += len(out)
+            self.stats["misses"] += len(uniq) - len(out)
+        return out
+
+    def put_many(self, items: Dict[bytes, np.ndarray]):
+        if self.read_only or not items:
+            return
+        now = time.time()
+        rows = [(k, np.asarray(v, dtype=np.float16).tobytes(), now) for k, v in items.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings(key, vec, last_used) VALUES (?, ?, ?)", rows)
+            self.stats["writes"] += len(rows)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        # drop the least recently used entries down to 90% so we don't evict on every write
+        n = count - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (n,)
+        )
+        self.stats["evictions"] += n
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return dict(self.stats, size=size)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,62 @@
+
+import multiprocessing as mp, os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+WARM_UP_TIMEOUT = float(os.environ.get("ENGINE_WARM_UP_TIMEOUT", "600"))
+_barrier = None
+
+def _init_worker(threads_per_worker: int, barrier):
+    global _barrier
+    import analyzer
+    _barrier = barrier
+    if analyzer.EMB_BACKEND == "torch":
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    else:
+        analyzer.EMB_NUM_THREADS = threads_per_worker
+    analyzer.get_model()
+
+def _call(fn_name: str, args: tuple):
+    import analyzer
+    return getattr(analyzer, fn_name)(*args)
+
+def _warm_up(baseline_paths: List[str]):
+    import analyzer
+    analyzer.warm_up(baseline_paths)
+    # hold this worker until every worker has taken a warm-up task, so none takes two
+    # and each one serves its first request warm
+    _barrier.wait(WARM_UP_TIMEOUT)
+
+# Runs analysis on a pool of worker processes. Workers are started from a forkserver
+# (spawn where unavailable), never forked from the threaded server, and each loads its
+# own copy of the model in the initializer.
+class ProcessEngine:
+    def __init__(self, workers: Optional[int] = None, threads_per_worker: int = 1):
+        threads_per_worker = max(1, threads_per_worker)
+        self.workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+        self.threads_per_worker = threads_per_worker
+        ctx = mp.get_context("forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=ctx, initializer=_init_worker,
+                                         initargs=(threads_per_worker, ctx.Barrier(self.workers)))
+
+    def analyze(self, *args) -> Dict[str, Any]:
+        return self._pool.submit(_call, "analyze", args).result()
+
+    def analyze_many(self, texts: List[str], baseline_paths: List[str], top_k: int) -> List[Dict[str, Any]]:
+        # one contiguous slice per worker keeps each slice batched inside its worker
+        step = -(-len(texts) // self.workers) or 1
+        futs = [self._pool.submit(_call, "analyze_many", (texts[i:i + step], baseline_paths[i:i + step], top_k))
+                for i in range(0, len(texts), step)]
+        return [r for f in futs for r in f.result()]
+
+    def encode(self, texts: List[str], batch_size: int):
+        return self._pool.submit(_call, "encode", (texts, batch_size)).result()
+
+    def warm_up(self, baseline_paths: List[str]):
+        # one task per worker, pinned there by the barrier in _warm_up
+        for f in [self._pool.submit(_warm_up, baseline_paths) for _ in range(self.workers)]:
+            f.result()
+
+    def shutdown(self):
+        self._pool.shutdown(cancel_futures=True)
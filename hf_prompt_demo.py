@@ -1,39 +1,30 @@
 
 import argparse, json
 from transformers import pipeline
+from llm import build_prompt, merge_deviations, parse_deviations, split_windows
 
 MODEL = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
-TEMPLATE = """You are a document analyst. Extract deviations and risks from the text.
-Return STRICT JSON array of objects with keys:
-item, expected, found, risk (low|medium|high), explanation
+WINDOW_TOKENS = 1000   # leaves room for the instructions and 512 new tokens in a 2048 context
 
-Baseline expectations (examples):
-- Termination notice >= 30 days
-- Governing law = Delaware
-- PHI requires Business Associate Agreement (BAA)
-
-Document text:
----
-{doc}
----
-JSON ONLY:"""
-
-def main(text: str):
+def main(text: str, window_tokens: int = WINDOW_TOKENS, batch_size: int = 4):
     generator = pipeline("text-generation", model=MODEL, torch_dtype="auto", device_map="auto")
-    prompt = TEMPLATE.format(doc=text[:4000])
-    out = generator(prompt, max_new_tokens=512, do_sample=False)[0]["generated_text"]
-    start = out.find("[")
-    end = out.rfind("]")
-    payload = out[start:end+1] if (start != -1 and end != -1 and end > start) else "[]"
-    try:
-        data = json.loads(payload)
-    except Exception:
-        data = []
-    print(json.dumps({"model": MODEL, "deviations": data}, indent=2))
+    tok = generator.tokenizer
+    if tok.pad_token_id is None:
+        tok.pad_token_id = tok.eos_token_id
+    tok.padding_side = "left"  # decoder-only batches must be left-padded
+    # the whole document is reviewed in windows measured with the model's own tokenizer,
+    # generated in padded batches rather than one prompt at a time
+    count = lambda s: len(tok.encode(s, add_special_tokens=False))
+    prompts = [build_prompt(w) for w in split_windows(text, window_tokens, count) or [""]]
+    outs = generator(prompts, batch_size=batch_size, max_new_tokens=512, do_sample=False, return_full_text=False)
+    data = merge_deviations(parse_deviations(o[0]["generated_text"]) for o in outs)
+    print(json.dumps({"model": MODEL, "windows": len(prompts), "deviations": data}, indent=2))
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--text-file", type=str, default="samples/sample_text.txt")
+    ap.add_argument("--window-tokens", type=int, default=WINDOW_TOKENS)
+    ap.add_argument("--batch-size", type=int, default=4)
     args = ap.parse_args()
     text = open(args.text_file).read()
-    main(text)
+    main(text, args.window_tokens, args.batch_size)
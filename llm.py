@@ -0,0 +1,323 @@
+
+import asyncio, json, os, re
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+from analyzer import chunk_text
+
+# Shared async Ollama client for /explain: one keep-alive connection pool for the
+# process, a concurrency cap per model (a local Ollama serves a model's requests
+# one slot at a time, so extra callers only queue inside it) and a hard timeout.
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST")  # None -> the ollama package default (localhost:11434)
+OLLAMA_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", "120"))
+OLLAMA_MAX_CONNECTIONS = int(os.environ.get("OLLAMA_MAX_CONNECTIONS", "16"))
+OLLAMA_MODEL_CONCURRENCY = int(os.environ.get("OLLAMA_MODEL_CONCURRENCY", "2"))
+DEFAULT_MODEL = "llama3"
+# map-reduce over long documents: sentence-aligned windows of at most this many
+# (estimated) tokens are reviewed concurrently and their deviations merged
+WINDOW_TOKENS = int(os.environ.get("EXPLAIN_WINDOW_TOKENS", "1500"))
+# prompts per request beyond which /explain refuses the document: windows past the
+# per-model concurrency queue behind each other, so latency grows with the count
+MAX_WINDOWS = int(os.environ.get("EXPLAIN_MAX_WINDOWS", "8"))
+CHARS_PER_TOKEN = 4   # rough estimate for English text when no tokenizer is at hand
+
+DEFAULT_HINTS = ["Termination notice >= 30 days", "Governing law = Delaware",
+                 "PHI requires Business Associate Agreement (BAA)"]
+
+TEMPLATE = """You are a document analyst. Extract deviations and risks from the text.
+Return STRICT JSON array of objects with keys:
+item, expected, found, risk (low|medium|high), explanation
+
+Baseline expectations (examples):
+{hints}
+
+Document text:
+---
+{doc}
+---
+JSON ONLY."""
+
+# retrieval mode: instead of raw document text, each baseline requirement is sent with
+# only the chunks the embedding matcher ranked closest to it
+RETRIEVAL_TEMPLATE = """You are a document analyst. For each baseline requirement below, compare it
+with the excerpts retrieved from the document and report deviations and risks.
+Return STRICT JSON array of objects with keys:
+item (the requirement id in brackets), expected, found, risk (low|medium|high), explanation
+{hints}
+Requirements and relevant document excerpts:
+---
+{sections}
+---
+JSON ONLY."""
+
+def build_prompt(doc: str, hints: Optional[List[str]] = None) -> str:
+    return TEMPLATE.format(hints="\n".join(f"- {h}" for h in (hints or DEFAULT_HINTS)), doc=doc)
+
+def requirement_section(key: str, requirement: str, match: Optional[Dict[str, Any]]) -> str:
+    excerpts = [c["chunk"] for c in match["candidates"]] if match else []
+    lines = [f"[{key}] {requirement}"] + [f"  > {e}" for e in excerpts]
+    return "\n".join(lines if excerpts else lines + ["  > (no related text found)"])
+
+def retrieval_batches(requirements: Dict[str, str], matches: Dict[str, Dict[str, Any]],
+                      max_tokens: int = WINDOW_TOKENS) -> List[Dict[str, str]]:
+    # requirements -> their sections (requirement plus its analyzer matches' top-k candidate
+    # chunks), packed into as few prompts as the token budget allows
+    batches, cur, used = [], {}, 0
+    for key, text in requirements.items():
+        section = requirement_section(key, text, matches.get(key))
+        n = estimate_tokens(section)
+        if cur and used + n > max_tokens:
+            batches.append(cur)
+            cur, used = {}, 0
+        cur[key] = section
+        used += n
+    if cur:
+        batches.append(cur)
+    return batches
+
+def retrieval_prompt(sections: Dict[str, str], hints: Optional[List[str]] = None) -> str:
+    extra = "\nAlso check:\n" + "\n".join(f"- {h}" for h in hints) + "\n" if hints else ""
+    return RETRIEVAL_TEMPLATE.format(hints=extra, sections="\n\n".join(sections.values()))
+
+def retrieval_prompts(requirements: Dict[str, str], matches: Dict[str, Dict[str, Any]],
+                      hints: Optional[List[str]] = None, max_tokens: int = WINDOW_TOKENS) -> List[str]:
+    return [retrieval_prompt(b, hints) for b in retrieval_batches(requirements, matches, max_tokens)]
+
+def parse_answer(content: str) -> Optional[List[Dict[str, Any]]]:
+    # None when the completion holds no usable JSON array, as opposed to an empty one
+    start = content.find("[")
+    if start == -1:
+        return None
+    end = content.rfind("]")
+    if end > start:
+        try:
+            return json.loads(content[start:end+1])
+        except ValueError:
+            pass
+    # no closing bracket (truncated completion) or a malformed tail: keep every
+    # complete object before it
+    return DeviationParser().feed(content) or None
+
+def parse_deviations(content: str) -> List[Dict[str, Any]]:
+    return parse_answer(content) or []
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def split_windows(text: str, max_tokens: int = WINDOW_TOKENS,
+                  count_tokens: Callable[[str], int] = estimate_tokens) -> List[str]:
+    # packs consecutive chunk_text() sentences into windows, so a clause is never cut
+    # in half; a single sentence over the budget is split by characters
+    windows, cur, used = [], [], 0
+    for chunk in chunk_text(text):
+        n = count_tokens(chunk)
+        if n > max_tokens:
+            step = max(1, len(chunk) * max_tokens // n)
+            pieces = [chunk[i:i + step] for i in range(0, len(chunk), step)]
+        else:
+            pieces = [chunk]
+        for piece in pieces:
+            n = count_tokens(piece)
+            if cur and used + n > max_tokens:
+                windows.append(" ".join(cur))
+                cur, used = [], 0
+            cur.append(piece)
+            used += n + 1
+    if cur:
+        windows.append(" ".join(cur))
+    return windows
+
+def _dedupe_key(deviation: Dict[str, Any]):
+    norm = lambda v: re.sub(r"\s+", " ", str(v or "")).strip().lower()
+    return norm(deviation.get("item")), norm(deviation.get("found"))
+
+def merge_deviations(results: Iterable[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    # windows are reviewed independently, so the same finding can come back more than once
+    merged, seen = [], set()
+    for deviations in results:
+        for d in deviations:
+            if not isinstance(d, dict):
+                continue
+            key = _dedupe_key(d)
+            if key not in seen:
+                seen.add(key)
+                merged.append(d)
+    return merged
+
+class DeviationParser:
+    # Incremental parser for the model's JSON array: feed() completion text as it arrives
+    # and get back the objects whose closing brace it contained. An object that does not
+    # parse is skipped without losing the ones around it.
+    def __init__(self):
+        self.done = False
+        self._in_array = False
+        self._depth = 0
+        self._in_str = False
+        self._escaped = False
+        self._buf: List[str] = []
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        out = []
+        for ch in text:
+            if self.done:
+                break
+            if not self._in_array:
+                self._in_array = ch == "["
+                continue
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth, self._buf = 1, ["{"]
+                elif ch == "]":
+                    self.done = True
+                continue
+            self._buf.append(ch)
+            if self._in_str:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_str = False
+            elif ch == '"':
+                self._in_str = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        obj = json.loads("".join(self._buf))
+                    except ValueError:
+                        continue
+                    if isinstance(obj, dict):
+                        out.append(obj)
+        return out
+
+class OllamaPool:
+    def __init__(self, host: Optional[str] = OLLAMA_HOST, timeout: float = OLLAMA_TIMEOUT,
+                 max_connections: int = OLLAMA_MAX_CONNECTIONS, model_concurrency: int = OLLAMA_MODEL_CONCURRENCY):
+        self.host, self.timeout = host, timeout
+        self.max_connections, self.model_concurrency = max_connections, model_concurrency
+        self.stats = {"requests": 0, "timeouts": 0, "cancelled": 0, "errors": 0}
+        self._client = None
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._waiting: Dict[str, int] = {}
+
+    def client(self):
+        if self._client is None:
+            import httpx, ollama  # optional dependency, only needed once /explain is used
+            self._client = ollama.AsyncClient(
+                host=self.host, timeout=httpx.Timeout(self.timeout, connect=5.0),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections))
+        return self._client
+
+    @asynccontextmanager
+    async def _slot(self, model: str, deadline: float):
+        # OLLAMA_TIMEOUT runs from the call, so time spent queued for a slot counts too
+        slots = self._slots.setdefault(model, asyncio.Semaphore(self.model_concurrency))
+        loop = asyncio.get_running_loop()
+        self.stats["requests"] += 1
+        self._waiting[model] = self._waiting.get(model, 0) + 1
+        try:
+            try:
+                await asyncio.wait_for(slots.acquire(), max(deadline - loop.time(), 0))
+            finally:
+                self._waiting[model] -= 1
+            try:
+                yield
+            finally:
+                slots.release()
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            self.stats["cancelled"] += 1
+            raise
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+
+    async def chat(self, model: str, prompt: str) -> str:
+        client = self.client()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        async with self._slot(model, deadline):
+            resp = await asyncio.wait_for(
+                client.chat(model=model, messages=[{"role": "user", "content": prompt}],
+                            options={"temperature": 0.0}),
+                max(deadline - loop.time(), 0))
+        return resp["message"]["content"]
+
+    async def stream(self, model: str, prompt: str) -> AsyncIterator[str]:
+        # yields completion text as Ollama generates it; OLLAMA_TIMEOUT bounds queueing plus generation
+        client = self.client()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        async with self._slot(model, deadline):
+            parts = await asyncio.wait_for(
+                client.chat(model=model, messages=[{"role": "user", "content": prompt}],
+                            options={"temperature": 0.0}, stream=True),
+                max(deadline - loop.time(), 0))
+            parts = parts.__aiter__()
+            while True:
+                try:
+                    part = await asyncio.wait_for(parts.__anext__(), max(deadline - loop.time(), 0))
+                except StopAsyncIteration:
+                    break
+                yield part["message"]["content"]
+
+    async def complete(self, model: str, prompts: List[str]) -> List[str]:
+        # the first failed window fails the request, so its siblings are cancelled rather
+        # than left generating for nobody while holding per-model slots
+        tasks = [asyncio.ensure_future(self.chat(model, p)) for p in prompts]
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    async def explain(self, model: str, prompts: List[str]) -> List[Dict[str, Any]]:
+        return merge_deviations(parse_deviations(c) for c in await self.complete(model, prompts))
+
+    async def stream_deviations(self, model: str, prompts: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        # all prompts generate concurrently; each new deviation is yielded as it completes
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def run(prompt):
+            parser = DeviationParser()
+            try:
+                async for text in self.stream(model, prompt):
+                    for deviation in parser.feed(text):
+                        queue.put_nowait(deviation)
+            finally:
+                queue.put_nowait(None)
+
+        tasks = [asyncio.ensure_future(run(p)) for p in prompts]
+        seen, pending = set(), len(tasks)
+        try:
+            while pending:
+                deviation = await queue.get()
+                if deviation is None:
+                    pending -= 1
+                    continue
+                key = _dedupe_key(deviation)
+                if key not in seen:
+                    seen.add(key)
+                    yield deviation
+            for t in tasks:
+                t.result()  # surface the first failed window
+        finally:
+            for t in tasks:
+                if t.done() and not t.cancelled():
+                    t.exception()  # already reported above, or abandoned by the consumer
+                else:
+                    t.cancel()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client._client.aclose()  # the underlying httpx.AsyncClient
+            self._client = None
+
+    def info(self) -> Dict[str, Any]:
+        return dict(self.stats, waiting={m: n for m, n in self._waiting.items() if n})
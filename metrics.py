@@ -0,0 +1,94 @@
+
+import threading, time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Minimal Prometheus text-format metrics: labelled histograms plus callback
+# collectors for counters the caches/batcher already keep. Timing spans feed
+# the stage histogram and, inside profiling(), a per-request breakdown.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets, label: Optional[str] = None):
+        self.name, self.help, self.buckets, self.label = name, help, tuple(buckets), label
+        self._series: Dict[str, List[float]] = {}  # label value -> bucket counts + [sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, label_value: str = ""):
+        with self._lock:
+            s = self._series.get(label_value)
+            if s is None:
+                s = self._series[label_value] = [0.0] * (len(self.buckets) + 2)
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for label_value, s in sorted(series.items()):
+            lbl = f'{self.label}="{label_value}",' if self.label else ""
+            for b, n in zip(self.buckets, s):
+                lines.append(f'{self.name}_bucket{{{lbl}le="{b}"}} {int(n)}')
+            lines.append(f'{self.name}_bucket{{{lbl}le="+Inf"}} {int(s[-1])}')
+            suffix = f"{{{lbl.rstrip(',')}}}" if lbl else ""
+            lines.append(f"{self.name}_sum{suffix} {s[-2]}")
+            lines.append(f"{self.name}_count{suffix} {int(s[-1])}")
+        return lines
+
+STAGE_SECONDS = Histogram("analyzer_stage_seconds", "Time spent per analysis stage.", LATENCY_BUCKETS, "stage")
+DOCUMENT_CHUNKS = Histogram("analyzer_document_chunks", "Chunks per analyzed document.", SIZE_BUCKETS)
+ENCODE_BATCH_TEXTS = Histogram("analyzer_encode_batch_size", "Texts per embedding model call.", SIZE_BUCKETS)
+_histograms = [STAGE_SECONDS, DOCUMENT_CHUNKS, ENCODE_BATCH_TEXTS]
+
+# name -> (type, help, callback returning a value or {label_value: value}, label name)
+_collectors: Dict[str, Tuple[str, str, Callable, Optional[str]]] = {}
+
+def register(name: str, kind: str, help: str, fn: Callable, label: Optional[str] = None):
+    _collectors[name] = (kind, help, fn, label)
+
+_profile: ContextVar[Optional[Dict[str, float]]] = ContextVar("profile", default=None)
+
+@contextmanager
+def span(stage: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        STAGE_SECONDS.observe(dt, stage)
+        prof = _profile.get()
+        if prof is not None:
+            prof[stage] = prof.get(stage, 0.0) + dt
+
+@contextmanager
+def profiling():
+    prof: Dict[str, float] = {}
+    token = _profile.set(prof)
+    try:
+        yield prof
+    finally:
+        _profile.reset(token)
+
+def render() -> str:
+    lines = []
+    for h in _histograms:
+        lines += h.render()
+    for name, (kind, help, fn, label) in _collectors.items():
+        try:
+            value = fn()
+        except Exception:
+            continue
+        if value is None:
+            continue
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+        if isinstance(value, dict):
+            lines += [f'{name}{{{label}="{k}"}} {v}' for k, v in sorted(value.items())]
+        else:
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -1,47 +1,34 @@
 import argparse, json, sys
+from concurrent.futures import ThreadPoolExecutor
 try:
     import ollama
 except Exception as e:
     print("ImportError: make sure you `pip install ollama` and `brew install ollama && ollama run llama3` once.", file=sys.stderr)
     raise
+from llm import WINDOW_TOKENS, build_prompt, merge_deviations, parse_deviations, split_windows
 
 MODEL = "llama3"  # you can change to 'llama3.1' or any pulled model
 
-TEMPLATE = """You are a document analyst. Extract deviations and risks from the text.
-Return STRICT JSON array of objects with keys:
-item, expected, found, risk (low|medium|high), explanation
-
-Baseline expectations (examples):
-- Termination notice >= 30 days
-- Governing law = Delaware
-- PHI requires Business Associate Agreement (BAA)
-
-Document text:
----
-{doc}
----
-JSON ONLY."""
-
-def main(text: str):
-    prompt = TEMPLATE.format(doc=text[:6000])
+def review(prompt: str):
     resp = ollama.chat(
         model=MODEL,
         messages=[{"role":"user","content": prompt}],
         options={"temperature": 0.0}
     )
-    content = resp["message"]["content"]
-    start = content.find("[")
-    end = content.rfind("]")
-    payload = content[start:end+1] if (start != -1 and end != -1 and end > start) else "[]"
-    try:
-        data = json.loads(payload)
-    except Exception:
-        data = []
-    print(json.dumps({"model": MODEL, "deviations": data}, indent=2))
+    return parse_deviations(resp["message"]["content"])
+
+def main(text: str, window_tokens: int = WINDOW_TOKENS, workers: int = 4):
+    # the whole document is reviewed in sentence-aligned windows sent concurrently
+    prompts = [build_prompt(w) for w in split_windows(text, window_tokens) or [""]]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        data = merge_deviations(pool.map(review, prompts))
+    print(json.dumps({"model": MODEL, "windows": len(prompts), "deviations": data}, indent=2))
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--text-file", type=str, default="samples/sample_text.txt")
+    ap.add_argument("--window-tokens", type=int, default=WINDOW_TOKENS)
+    ap.add_argument("--workers", type=int, default=4, help="windows in flight (match OLLAMA_NUM_PARALLEL)")
     args = ap.parse_args()
     text = open(args.text_file).read()
-    main(text)
+    main(text, args.window_tokens, args.workers)
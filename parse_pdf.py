@@ -1,13 +1,38 @@
 
 import argparse
-from pdf_utils import extract_text_from_pdf
+import pdf_utils
+from pdf_utils import get_cache, iter_pdf_pages, PAGES_PER_TASK
+from pdf_cache import PdfTextCache
+
+def write_pages(pages, f):
+    # streams "\n".join(pages).strip() without holding the whole text: leading
+    # whitespace is dropped and trailing whitespace is held back until more text follows
+    pending, started = "", False
+    for i, page in enumerate(pages):
+        piece = ("\n" if i else "") + page
+        if not started:
+            piece = piece.lstrip()
+            if not piece:
+                continue
+            started = True
+        body = piece.rstrip()
+        if body:
+            f.write(pending + body)
+            pending = piece[len(body):]
+        else:
+            pending += piece
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--pdf-file", required=True)
     ap.add_argument("--out", default="extracted.txt")
+    ap.add_argument("--workers", type=int, default=None, help="extraction processes (default: $PDF_WORKERS or min(4, CPU count))")
+    ap.add_argument("--pages-per-task", type=int, default=PAGES_PER_TASK)
+    ap.add_argument("--cache", default=None, help="extracted-text cache file (default: $PDF_CACHE_PATH, if set)")
     args = ap.parse_args()
-    text = extract_text_from_pdf(args.pdf_file)
+    if args.workers:
+        pdf_utils.PDF_WORKERS = args.workers
+    cache = PdfTextCache(args.cache) if args.cache else get_cache()
     with open(args.out, "w") as f:
-        f.write(text)
+        write_pages(iter_pdf_pages(args.pdf_file, args.workers, args.pages_per_task, cache), f)
     print(f"Wrote extracted text to {args.out}")
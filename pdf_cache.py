@@ -0,0 +1,175 @@
+
+import hashlib, io, sqlite3, threading, time
+from typing import Dict, List, Optional, Tuple
+
+import pypdf
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+# On-disk cache of extracted PDF text. Whole files are keyed by the SHA-256 of their
+# bytes; individual pages by a hash of every object the page reaches (content streams,
+# fonts, Form XObjects and their resources), so a new revision that shares pages with
+# a cached one only extracts the rest. Extraction workers open the same file, so the
+# cache must live on disk.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    key BLOB PRIMARY KEY,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_last_used ON pages(last_used);
+CREATE TABLE IF NOT EXISTS files (
+    sha BLOB PRIMARY KEY,
+    page_keys BLOB NOT NULL,
+    last_used REAL NOT NULL
+);
+"""
+_BATCH = 500
+
+def file_sha256(path: str) -> bytes:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.digest()
+
+# entries that point back up the document (page tree, annotation owners, article beads)
+# or carry nothing extract_text() reads
+_SKIP_KEYS = frozenset(["/Parent", "/P", "/Annots", "/B", "/Thumb", "/Metadata"])
+
+def page_key(page, memo: Optional[Dict] = None) -> bytes:
+    # hashes everything reachable from the page dictionary: content streams, fonts and
+    # Form XObjects with their own resources, so any change that can alter extracted
+    # text changes the key. `memo` shares digests of indirect objects (fonts, shared
+    # forms) across pages of one reader.
+    h = hashlib.sha256(pypdf.__version__.encode())  # extraction output can change across pypdf versions
+    h.update(_digest(page, {} if memo is None else memo, [])[0])
+    return h.digest()
+
+def _digest(obj, memo: Dict, stack: List) -> Tuple[bytes, int]:
+    # Merkle digest of a PDF object graph. Returns (digest, lowest stack position a
+    # cycle pointed back to); a digest is only memoized when it does not depend on
+    # objects above it in the current path.
+    if isinstance(obj, IndirectObject):
+        ref = (obj.idnum, obj.generation)
+        if ref in memo:
+            return memo[ref], len(stack)
+        if ref in stack:
+            pos = stack.index(ref)
+            return hashlib.sha256(b"cycle:%d" % (len(stack) - pos)).digest(), pos
+        stack.append(ref)
+        try:
+            d, low = _digest(obj.get_object(), memo, stack)
+        finally:
+            stack.pop()
+        if low >= len(stack):
+            memo[ref] = d
+        return d, low
+    h = hashlib.sha256()
+    low = len(stack)
+    if isinstance(obj, DictionaryObject):
+        h.update(b"stream" if isinstance(obj, StreamObject) else b"dict")
+        for key in sorted(obj):
+            if key in _SKIP_KEYS:
+                continue
+            d, l = _digest(obj.raw_get(key), memo, stack)
+            h.update(key.encode() + d)
+            low = min(low, l)
+        if isinstance(obj, StreamObject):
+            h.update(obj._data)  # still-encoded bytes; the /Filter entries are hashed above
+    elif isinstance(obj, ArrayObject):
+        h.update(b"array")
+        for item in obj:
+            d, l = _digest(item, memo, stack)
+            h.update(d)
+            low = min(low, l)
+    else:
+        buf = io.BytesIO()
+        obj.write_to_stream(buf)
+        h.update(type(obj).__name__.encode() + b":" + buf.getvalue())
+    return h.digest(), low
+
+class PdfTextCache:
+    def __init__(self, path: str, max_bytes: int = 256 << 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = {"file_hits": 0, "page_hits": 0, "page_misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def get_file(self, sha: bytes) -> Optional[List[str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT page_keys FROM files WHERE sha=?", (sha,)).fetchone()
+        if row is None:
+            return None
+        keys = [row[0][i:i + 32] for i in range(0, len(row[0]), 32)]
+        found = self.get_pages(keys, count=False)
+        if len(found) < len(set(keys)):
+            return None  # some pages were evicted; the caller falls back to page lookups
+        with self._lock:
+            self._conn.execute("UPDATE files SET last_used=? WHERE sha=?", (time.time(), sha))
+            self._conn.commit()
+            self.stats["file_hits"] += 1
+        return [found[k] for k in keys]
+
+    def get_pages(self, keys: List[bytes], count: bool = True) -> Dict[bytes, str]:
+        out = {}
+        uniq = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(uniq), _BATCH):
+                batch = uniq[i:i + _BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, text FROM pages WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                out.update(rows)
+            if out:
+                now = time.time()
+                self._conn.executemany("UPDATE pages SET last_used=? WHERE key=?", [(now, k) for k in out])
+                self._conn.commit()
+            if count:
+                self.stats["page_hits"] += len(out)
+                self.stats["page_misses"] += len(uniq) - len(out)
+        return out
+
+    def record(self, page_hits: int, page_misses: int):
+        # lookups made by extraction workers through their own connections
+        with self._lock:
+            self.stats["page_hits"] += page_hits
+            self.stats["page_misses"] += page_misses
+
+    def put(self, sha: bytes, keys: List[bytes], new_pages: Dict[bytes, str]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO pages(key, text, size, last_used) VALUES (?, ?, ?, ?)",
+                                   [(k, t, len(t.encode("utf-8")), now) for k, t in new_pages.items()])
+            self._conn.execute("INSERT OR REPLACE INTO files(sha, page_keys, last_used) VALUES (?, ?, ?)",
+                               (sha, b"".join(keys), now))
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # drop least recently used pages down to 90% of the bound, by key so pages that
+        # share a timestamp with the last one dropped survive; then file records older
+        # than that page, whose pages are most likely gone too
+        target, cutoff, keys = total - int(self.max_bytes * 0.9), None, []
+        for key, size, last_used in self._conn.execute("SELECT key, size, last_used FROM pages ORDER BY last_used, key"):
+            if target <= 0:
+                break
+            target -= size
+            cutoff = last_used
+            keys.append((key,))
+        self._conn.executemany("DELETE FROM pages WHERE key=?", keys)
+        self._conn.execute("DELETE FROM files WHERE last_used < ?", (cutoff,))
+        self.stats["evictions"] += len(keys)
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            pages, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+            files = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            return dict(self.stats, pages=pages, files=files, bytes=size)
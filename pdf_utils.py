@@ -1,9 +1,116 @@
 
+import multiprocessing, os, threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
 from pypdf import PdfReader
+from pdf_cache import PdfTextCache, file_sha256, page_key
 
-def extract_text_from_pdf(path: str) -> str:
+PAGES_PER_TASK = 8
+# one extraction pool per process, shared by every request and sized once. Workers
+# come from a forkserver (spawn where unavailable) so they never fork a threaded
+# server with torch loaded.
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(PDF_WORKERS, mp_context=multiprocessing.get_context(method))
+        return _pool
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+# extracted-text cache shared by every PDF ingest path; off unless PDF_CACHE_PATH is set
+PDF_CACHE_PATH = os.environ.get("PDF_CACHE_PATH")
+PDF_CACHE_MAX_MB = float(os.environ.get("PDF_CACHE_MAX_MB", "256"))
+_cache = None
+
+def get_cache() -> Optional[PdfTextCache]:
+    global _cache
+    if _cache is None and PDF_CACHE_PATH:
+        _cache = PdfTextCache(PDF_CACHE_PATH, int(PDF_CACHE_MAX_MB * (1 << 20)))
+    return _cache
+
+def _extract_pages(path: str, indices: List[int]) -> List[str]:
     reader = PdfReader(path)
-    parts = []
-    for page in reader.pages:
-        parts.append(page.extract_text() or "")
-    return "\n".join(parts).strip()
+    return [reader.pages[i].extract_text() or "" for i in indices]
+
+_worker_caches: Dict[str, PdfTextCache] = {}
+
+def _extract_keyed(path: str, indices: List[int], cache_path: str) -> List[Tuple[bytes, str, bool]]:
+    # runs in the extraction workers: keys the pages, reuses cached text for pages seen
+    # in other files and extracts the rest. Returns (key, text, was_cached) per page.
+    cache = _worker_caches.get(cache_path)
+    if cache is None:
+        cache = _worker_caches[cache_path] = PdfTextCache(cache_path)
+    reader, memo = PdfReader(path), {}
+    keys = [page_key(reader.pages[i], memo) for i in indices]
+    known = cache.get_pages(keys, count=False)
+    return [(k, known[k], True) if k in known else (k, reader.pages[i].extract_text() or "", False)
+            for i, k in zip(indices, keys)]
+
+def _iter_extract(path: str, indices: List[int], workers: int, pages_per_task: int, fn=_extract_pages, *args) -> Iterator:
+    # yields fn's per-page results in order while the shared pool works on page groups
+    # ahead of the consumer; at most 2 groups per worker are in flight so memory stays bounded
+    global _pool
+    if workers <= 1 or len(indices) <= pages_per_task:
+        yield from fn(path, indices, *args)
+        return
+    groups = iter([indices[s:s + pages_per_task] for s in range(0, len(indices), pages_per_task)])
+    pool = get_pool()
+    pending = deque()
+    try:
+        pending.extend(pool.submit(fn, path, g, *args) for g in islice(groups, 2 * workers))
+        while pending:
+            results = pending.popleft().result()
+            nxt = next(groups, None)
+            if nxt is not None:
+                pending.append(pool.submit(fn, path, nxt, *args))
+            yield from results
+    except BrokenProcessPool:
+        with _pool_lock:  # a worker died; the next request gets a fresh pool
+            if _pool is pool:
+                _pool = None
+        raise
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+def iter_pdf_pages(path: str, workers: Optional[int] = None, pages_per_task: int = PAGES_PER_TASK,
+                   cache: Optional[PdfTextCache] = None) -> Iterator[str]:
+    workers = min(workers or PDF_WORKERS, PDF_WORKERS)
+    if cache is None:
+        yield from _iter_extract(path, list(range(len(PdfReader(path).pages))), workers, pages_per_task)
+        return
+    sha = file_sha256(path)
+    texts = cache.get_file(sha)
+    if texts is not None:
+        yield from texts
+        return
+    indices = list(range(len(PdfReader(path).pages)))
+    # unseen file: pages are keyed and looked up by the workers alongside extraction, so
+    # page 1 is yielded as soon as its group is done
+    keys, new, hits = [], {}, 0
+    for key, text, cached in _iter_extract(path, indices, workers, pages_per_task, _extract_keyed, cache.path):
+        keys.append(key)
+        if cached:
+            hits += 1
+        else:
+            new[key] = text
+        yield text
+    cache.record(hits, len(keys) - hits)
+    cache.put(sha, keys, new)
+
+def extract_text_from_pdf(path: str, workers: Optional[int] = None, cache: Optional[PdfTextCache] = None) -> str:
+    return "\n".join(iter_pdf_pages(path, workers, cache=cache)).strip()
@@ -0,0 +1,51 @@
+
+import threading, time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import orjson
+
+# In-memory LRU cache of analyze() results with a TTL and a memory bound measured
+# as the serialized size of each entry.
+class ResultCache:
+    def __init__(self, max_bytes: int = 64 << 20, ttl: float = 300.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[2]
+
+    def put(self, key: str, value: Any):
+        size = len(orjson.dumps(value))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.stats["evictions"] += 1
+
+    def _drop(self, key: str):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, size=len(self._data), bytes=self._bytes)
@@ -0,0 +1,90 @@
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Baseline requirements compiled once into rule objects. check() takes the candidate
+# chunk and its lowercased form and returns (expected, found, risk) on violation, else None.
+Violation = Optional[Tuple[str, str, str]]
+
+class NumericDaysRule:
+    excerpt = False  # found is a verdict ("15 days"), not document text
+    pattern = re.compile(r'(\d+)\s*day')
+
+    def __init__(self, meta: Dict[str, Any]):
+        self.min_days = meta.get("expected_min_days", 30)
+        self.expected = f">= {self.min_days} days"
+        self.risk = meta.get("risk_if_below", "medium")
+
+    def check(self, found: str, lowered: str) -> Violation:
+        m = self.pattern.search(lowered)
+        found_days = int(m.group(1)) if m else None
+        if found_days is None or found_days < self.min_days:
+            return (self.expected, f"{found_days} days" if found_days is not None else "N/A", self.risk)
+        return None
+
+class KeywordRule:
+    excerpt = True  # found is the offending chunk
+
+    def __init__(self, meta: Dict[str, Any]):
+        self.expected = meta.get("expected_value", "").lower()
+        self.risk = meta.get("risk_if_mismatch", "low")
+
+    def check(self, found: str, lowered: str) -> Violation:
+        if self.expected and self.expected not in lowered:
+            return (self.expected, found[:300], self.risk)
+        return None
+
+class MustIncludeAnyRule:
+    excerpt = True
+
+    def __init__(self, meta: Dict[str, Any]):
+        keywords = [kw.lower() for kw in meta.get("required_keywords", [])]
+        self.expected = f"include one of: {', '.join(keywords)}"
+        self.risk = meta.get("risk_if_missing", "high")
+        # one alternation scan instead of a substring test per keyword; longest first
+        # so overlapping keywords still match
+        alts = sorted(set(keywords), key=len, reverse=True)
+        self.pattern = re.compile("|".join(map(re.escape, alts))) if alts else None
+
+    def check(self, found: str, lowered: str) -> Violation:
+        if self.pattern is None or self.pattern.search(lowered) is None:
+            return (self.expected, found[:300], self.risk)
+        return None
+
+RULE_TYPES = {
+    "numeric_days": NumericDaysRule,
+    "keyword": KeywordRule,
+    "must_include_any": MustIncludeAnyRule,
+}
+
+def compile_rules(baseline: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    # requirements with an unknown type are skipped, as apply_rules always did
+    return [(key, RULE_TYPES[meta.get("type")](meta))
+            for key, meta in baseline["requirements"].items()
+            if meta.get("type") in RULE_TYPES]
+
+_REQUIRED_FIELDS = {
+    "numeric_days": ("expected_min_days", int),
+    "keyword": ("expected_value", str),
+    "must_include_any": ("required_keywords", list),
+}
+
+def validate_baseline(baseline: Any) -> List[str]:
+    # returns human-readable problems; an empty list means the baseline is usable
+    if not isinstance(baseline, dict) or not isinstance(baseline.get("requirements"), dict):
+        return ["baseline must be a mapping with a 'requirements' mapping"]
+    errors = []
+    for key, meta in baseline["requirements"].items():
+        if not isinstance(meta, dict):
+            errors.append(f"{key}: requirement must be a mapping")
+            continue
+        if not isinstance(meta.get("text"), str) or not meta["text"].strip():
+            errors.append(f"{key}: missing 'text'")
+        rule_type = meta.get("type")
+        if rule_type not in RULE_TYPES:
+            errors.append(f"{key}: unknown type {rule_type!r} (expected one of {', '.join(RULE_TYPES)})")
+            continue
+        field, kind = _REQUIRED_FIELDS[rule_type]
+        if field in meta and not isinstance(meta[field], kind):
+            errors.append(f"{key}: '{field}' must be a {kind.__name__}")
+    return errors
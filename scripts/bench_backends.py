@@ -0,0 +1,50 @@
+
+# Compare embedding backends on the sample contracts: encode throughput relative to
+# the torch backend, and drift of the baseline x chunk similarity scores against it.
+#   python scripts/bench_backends.py --backends torch onnx onnx-int8
+import argparse, os, sys, time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import analyzer
+
+def load_encoder(backend: str):
+    analyzer.EMB_BACKEND = backend
+    analyzer._model = None
+    return analyzer.get_model()
+
+def bench(model, texts, repeat: int, batch_size: int) -> float:
+    model.encode(texts[:batch_size], batch_size=batch_size, normalize_embeddings=True)  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+    return (time.perf_counter() - t0) / repeat
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--text-files", nargs="+", default=["samples/sample_text.txt", "samples/extracted.txt"])
+    ap.add_argument("--baseline", type=str, default=analyzer.DEFAULT_BASELINE)
+    ap.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--batch-size", type=int, default=analyzer.ENCODE_BATCH_SIZE)
+    args = ap.parse_args()
+
+    chunks = []
+    for path in args.text_files:
+        with open(path) as f:
+            chunks += analyzer.chunk_text(f.read())
+    baseline = analyzer.load_baseline(args.baseline)
+    reqs = [v["text"] for v in baseline["requirements"].values()]
+
+    ref = None
+    for backend in args.backends:
+        model = load_encoder(backend)
+        secs = bench(model, chunks, args.repeat, args.batch_size)
+        scores = model.encode(reqs, normalize_embeddings=True) @ model.encode(chunks, normalize_embeddings=True).T
+        if ref is None:
+            ref = (backend, secs, scores)
+        drift = np.abs(scores - ref[2])
+        top1 = float((scores.argmax(axis=1) == ref[2].argmax(axis=1)).mean())
+        print(f"{backend:>10}: {secs * 1000:8.1f} ms/pass ({len(chunks)} chunks)  "
+              f"speedup vs {ref[0]} {ref[1] / secs:5.2f}x  "
+              f"score drift max {drift.max():.4f} mean {drift.mean():.4f}  top-1 agreement {top1:.0%}")
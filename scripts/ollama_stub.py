@@ -0,0 +1,73 @@
+
+# Stand-in for a local Ollama server when load-testing /explain: answers /api/chat with
+# a canned deviations array after a configurable delay, streamed token by token
+# (NDJSON, like Ollama) when the request asks for it.
+#   python scripts/ollama_stub.py --port 11435 --latency 2 --tokens-per-sec 50
+#   OLLAMA_HOST=http://127.0.0.1:11435 uvicorn app:app
+import argparse, asyncio, json, re, time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CANNED = [
+    {"item": "termination_notice", "expected": ">= 30 days", "found": "15 days", "risk": "high",
+     "explanation": "Notice period is shorter than the baseline requires."},
+    {"item": "governing_law", "expected": "Delaware", "found": "New York", "risk": "medium",
+     "explanation": "Contract is governed by a different jurisdiction."},
+]
+
+app = FastAPI(title="Ollama stub")
+app.state.latency = 1.0
+app.state.tokens_per_sec = 0.0
+app.state.active = 0
+app.state.peak = 0
+app.state.prompt_chars = 0
+
+def _tokens(text: str):
+    return re.findall(r"\s*\S+", text)
+
+def _message(model: str, content: str, done: bool, **extra):
+    return {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message": {"role": "assistant", "content": content}, "done": done, **extra}
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    body = await request.json()
+    model = body.get("model", "stub")
+    app.state.prompt_chars += sum(len(m.get("content", "")) for m in body.get("messages", []))
+    content = json.dumps(CANNED, indent=1)
+    delay = 1.0 / app.state.tokens_per_sec if app.state.tokens_per_sec else 0.0
+    tokens = _tokens(content)
+
+    async def generate():
+        app.state.active += 1
+        app.state.peak = max(app.state.peak, app.state.active)
+        try:
+            await asyncio.sleep(app.state.latency)
+            for tok in tokens:
+                if delay:
+                    await asyncio.sleep(delay)
+                yield json.dumps(_message(model, tok, False)) + "\n"
+            yield json.dumps(_message(model, "", True, done_reason="stop", eval_count=len(tokens))) + "\n"
+        finally:
+            app.state.active -= 1
+
+    if body.get("stream", True):
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+    async for _ in generate():
+        pass
+    return JSONResponse(_message(model, content, True, done_reason="stop", eval_count=len(tokens)))
+
+@app.get("/stats")
+def stats():
+    return {"active": app.state.active, "peak": app.state.peak, "prompt_chars": app.state.prompt_chars}
+
+if __name__ == "__main__":
+    import uvicorn
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11435)
+    ap.add_argument("--latency", type=float, default=1.0, help="seconds before the first token")
+    ap.add_argument("--tokens-per-sec", type=float, default=0.0, help="token pacing after the first (0: no delay)")
+    args = ap.parse_args()
+    app.state.latency, app.state.tokens_per_sec = args.latency, args.tokens_per_sec
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
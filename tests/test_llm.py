@@ -0,0 +1,14 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm import parse_deviations
+
+def test_parse_deviations_valid_array():
+    content = 'Here you go:\n[{"item": "a", "found": "1"}, {"item": "b", "found": "2"}]\nDone.'
+    assert parse_deviations(content) == [{"item": "a", "found": "1"}, {"item": "b", "found": "2"}]
+
+def test_parse_deviations_truncated_keeps_complete_objects():
+    assert parse_deviations('[{"item":"a","found":"1"}, {"item":"b","fo') == [{"item": "a", "found": "1"}]
+
+def test_parse_deviations_no_array():
+    assert parse_deviations("I could not find any deviations.") == []